@@ -4,9 +4,17 @@ MLflow Status Checker
 
 This script checks if MLflow experiments exist and provides guidance.
 Run this to diagnose why MLflow UI is empty.
+
+Usage:
+    python scripts/check_mlflow_status.py [--quick]
 """
 
+import io
+import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
 # Colors for terminal output
@@ -16,6 +24,40 @@ YELLOW = "\033[93m"
 BLUE = "\033[94m"
 RESET = "\033[0m"
 
+# File extensions of saved model artifacts
+MODEL_SUFFIXES = (".pkl", ".joblib")
+
+# Per-thread output buffers so concurrent checks don't interleave their output
+_thread_output = threading.local()
+
+
+class _ThreadBufferedStdout:
+    """Stdout proxy that sends writes to the current thread's buffer, if any."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        return getattr(_thread_output, "buffer", self._stream).write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def _run_buffered(check):
+    """Run a check, capturing what it prints. Returns (result, output)."""
+    _thread_output.buffer = io.StringIO()
+    try:
+        return check(), _thread_output.buffer.getvalue()
+    finally:
+        del _thread_output.buffer
+
+
+def _scan_dirs(path):
+    """Return the DirEntry objects of all subdirectories of path."""
+    with os.scandir(path) as it:
+        return [entry for entry in it if entry.is_dir()]
+
 
 def print_status(message, status="info"):
     """Print colored status message."""
@@ -40,15 +82,19 @@ def check_project_structure():
 
     all_good = True
 
+    # One directory listing of cwd instead of a stat() per required path
+    with os.scandir(".") as it:
+        present = {entry.name: entry for entry in it}
+
     for dir_name in required_dirs:
-        if Path(dir_name).exists():
+        if dir_name in present and present[dir_name].is_dir():
             print_status(f"Directory '{dir_name}/' exists", "success")
         else:
             print_status(f"Directory '{dir_name}/' NOT FOUND", "error")
             all_good = False
 
     for file_name in required_files:
-        if Path(file_name).exists():
+        if file_name in present:
             print_status(f"File '{file_name}' exists", "success")
         else:
             print_status(f"File '{file_name}' NOT FOUND", "error")
@@ -65,8 +111,13 @@ def check_dataset():
 
     data_file = Path("data/raw/heart.csv")
 
-    if data_file.exists():
-        size = data_file.stat().st_size
+    # A single stat() both probes for the file and reads its size
+    try:
+        size = os.stat(data_file).st_size
+    except FileNotFoundError:
+        size = None
+
+    if size is not None:
         print_status(f"Dataset found: {data_file} ({size} bytes)", "success")
 
         # Check if file has content
@@ -82,15 +133,25 @@ def check_dataset():
         return False
 
 
-def check_mlflow_runs():
-    """Check if MLflow runs exist."""
+def check_mlflow_runs(quick=False):
+    """
+    Check if MLflow runs exist.
+
+    Args:
+        quick: Stop at the first run found instead of counting every run
+    """
     print("\n" + "=" * 60)
     print("CHECKING MLFLOW EXPERIMENTS")
     print("=" * 60)
 
     mlruns_dir = Path("mlruns")
 
-    if not mlruns_dir.exists():
+    # Check for experiment directories (cheap name test first, then d_type);
+    # scandir raises on a missing directory, so no separate exists() probe
+    try:
+        with os.scandir(mlruns_dir) as it:
+            experiment_dirs = [e for e in it if e.name.isdigit() and e.is_dir()]
+    except FileNotFoundError:
         print_status("mlruns/ directory NOT FOUND", "error")
         print_status("No experiments have been logged yet", "warning")
         print_status("Run: python scripts/train.py", "info")
@@ -98,11 +159,6 @@ def check_mlflow_runs():
 
     print_status("mlruns/ directory exists", "success")
 
-    # Check for experiment directories
-    experiment_dirs = [
-        d for d in mlruns_dir.iterdir() if d.is_dir() and d.name.isdigit()
-    ]
-
     if not experiment_dirs:
         print_status("No experiment directories found", "error")
         print_status("Run: python scripts/train.py", "info")
@@ -111,11 +167,20 @@ def check_mlflow_runs():
     print_status(f"Found {len(experiment_dirs)} experiment(s)", "success")
 
     # Check for runs in experiments
+    if quick:
+        for exp_dir in experiment_dirs:
+            with os.scandir(exp_dir) as it:
+                if any(d.is_dir() and d.name != "meta.yaml" for d in it):
+                    print_status(f"Experiment {exp_dir.name} has runs", "success")
+                    return True
+
+        print_status("No runs found in experiments", "error")
+        print_status("Run: python scripts/train.py", "info")
+        return False
+
     total_runs = 0
     for exp_dir in experiment_dirs:
-        run_dirs = [
-            d for d in exp_dir.iterdir() if d.is_dir() and d.name != "meta.yaml"
-        ]
+        run_dirs = [d for d in _scan_dirs(exp_dir) if d.name != "meta.yaml"]
         total_runs += len(run_dirs)
 
         if len(run_dirs) > 0:
@@ -140,17 +205,20 @@ def check_models():
 
     models_dir = Path("models")
 
-    if not models_dir.exists():
+    # Look for model files in a single directory pass
+    try:
+        with os.scandir(models_dir) as it:
+            model_files = [
+                e.name for e in it if e.name.endswith(MODEL_SUFFIXES) and e.is_file()
+            ]
+    except FileNotFoundError:
         print_status("models/ directory NOT FOUND", "error")
         return False
 
-    # Look for model files
-    model_files = list(models_dir.glob("*.pkl")) + list(models_dir.glob("*.joblib"))
-
     if model_files:
         print_status(f"Found {len(model_files)} model file(s)", "success")
         for model_file in model_files:
-            print_status(f"  - {model_file.name}", "info")
+            print_status(f"  - {model_file}", "info")
         return True
     else:
         print_status("No model files found", "warning")
@@ -158,15 +226,18 @@ def check_models():
         return False
 
 
-def provide_recommendations():
-    """Provide recommendations based on checks."""
+def provide_recommendations(data_ok, mlflow_ok):
+    """
+    Provide recommendations based on checks.
+
+    Args:
+        data_ok: Result of check_dataset()
+        mlflow_ok: Result of check_mlflow_runs()
+    """
     print("\n" + "=" * 60)
     print("RECOMMENDATIONS")
     print("=" * 60)
 
-    data_ok = check_dataset()
-    mlflow_ok = check_mlflow_runs()
-
     if not data_ok:
         print(f"\n{YELLOW}STEP 1: Download the dataset{RESET}")
         print("  Command: python scripts/download_data.py")
@@ -190,27 +261,48 @@ def provide_recommendations():
 
 def main():
     """Main function."""
+    # --quick: only confirm that some MLflow run exists, skip counting them all
+    quick = "--quick" in sys.argv[1:]
+
     print(f"\n{BLUE}{'='*60}")
     print("MLflow Status Checker")
     print(f"{'='*60}{RESET}\n")
 
+    # The checks are independent stat/scandir work, so run them concurrently
+    # and replay each one's output in the usual order afterwards.
+    checks = {
+        "struct": check_project_structure,
+        "data": check_dataset,
+        "mlflow": partial(check_mlflow_runs, quick=quick),
+        "models": check_models,
+    }
+    stdout = sys.stdout
+    sys.stdout = _ThreadBufferedStdout(stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            futures = {
+                name: ex.submit(_run_buffered, check) for name, check in checks.items()
+            }
+            results = {name: fut.result() for name, fut in futures.items()}
+    finally:
+        sys.stdout = stdout
+
     # Check project structure
-    if not check_project_structure():
+    struct_ok, output = results.pop("struct")
+    print(output, end="")
+    if not struct_ok:
         print_status("\nERROR: Not in project root directory", "error")
         print_status("Navigate to: heart-disease-mlops/", "info")
         sys.exit(1)
 
-    # Check dataset
-    check_dataset()
-
-    # Check MLflow runs
-    check_mlflow_runs()
-
-    # Check models
-    check_models()
+    # Check dataset, MLflow runs and models
+    for _, output in results.values():
+        print(output, end="")
 
-    # Provide recommendations
-    provide_recommendations()
+    # Provide recommendations from the results gathered above
+    data_ok, _ = results["data"]
+    mlflow_ok, _ = results["mlflow"]
+    provide_recommendations(data_ok, mlflow_ok)
 
     print(f"\n{BLUE}{'='*60}{RESET}\n")
 
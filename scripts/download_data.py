@@ -6,13 +6,18 @@ This script downloads the Heart Disease dataset from UCI Machine Learning Reposi
 and saves it to the data/raw directory.
 """
 
-import os
-import urllib.request
 from pathlib import Path
 
+import pandas as pd
+
 
 def download_heart_disease_data():
-    """Download the Heart Disease UCI dataset."""
+    """
+    Download the Heart Disease UCI dataset.
+
+    Returns:
+        Tuple of (path to the saved CSV, loaded DataFrame)
+    """
 
     # Dataset URL (UCI ML Repository)
     # Using the processed Cleveland dataset
@@ -50,38 +55,15 @@ def download_heart_disease_data():
     print(f"URL: {url}")
 
     try:
-        # Download the data
-        urllib.request.urlretrieve(url, raw_data_dir / "heart_raw.data")
-
-        # Read and process the data
-        with open(raw_data_dir / "heart_raw.data", "r") as f:
-            lines = f.readlines()
-
-        # Write with proper CSV headers
-        with open(output_file, "w") as f:
-            # Write header
-            f.write(",".join(columns) + "\n")
-
-            # Write data rows
-            for line in lines:
-                line = line.strip()
-                if line:
-                    # Replace '?' with empty string for missing values
-                    line = line.replace("?", "")
-                    f.write(line + "\n")
-
-        # Clean up temporary file
-        os.remove(raw_data_dir / "heart_raw.data")
+        # Parse the download with pandas' C tokenizer ('?' marks missing values)
+        df = pd.read_csv(url, header=None, names=columns, na_values="?")
+        df.to_csv(output_file, index=False)
 
         print(f"✓ Dataset saved to: {output_file}")
         print(f"✓ Columns: {len(columns)}")
+        print(f"✓ Rows: {len(df)}")
 
-        # Count rows
-        with open(output_file, "r") as f:
-            row_count = sum(1 for _ in f) - 1  # Subtract header
-        print(f"✓ Rows: {row_count}")
-
-        return str(output_file)
+        return str(output_file), df
 
     except Exception as e:
         print(f"✗ Error downloading dataset: {e}")
@@ -92,12 +74,9 @@ def download_heart_disease_data():
         raise
 
 
-def verify_data(filepath: str):
+def verify_data(df: pd.DataFrame):
     """Verify the downloaded data."""
-    import pandas as pd
-
     print("\n--- Data Verification ---")
-    df = pd.read_csv(filepath)
     print(f"Shape: {df.shape}")
     print(f"Columns: {list(df.columns)}")
     print("\nFirst 5 rows:")
@@ -109,5 +88,5 @@ def verify_data(filepath: str):
 
 
 if __name__ == "__main__":
-    filepath = download_heart_disease_data()
-    verify_data(filepath)
+    filepath, df = download_heart_disease_data()
+    verify_data(df)
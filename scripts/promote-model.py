@@ -16,24 +16,89 @@ Examples:
     python scripts/promote-model.py heart-disease-logistic_regression 2
 """
 
+import os
 import sys
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from operator import itemgetter
 
 import mlflow
 from mlflow.tracking import MlflowClient
 
 # Add project root to path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
 
 
-def promote_model(model_name: str, version: str = None):
+def _iter_registered_models(client: MlflowClient, page_size: int = 200):
+    """
+    Yield registered models page by page instead of in one bulk query.
+
+    Args:
+        client: MLflow tracking client
+        page_size: Number of models to request per page
+    """
+    token = None
+    while True:
+        page = client.search_registered_models(max_results=page_size, page_token=token)
+        yield from page
+        token = page.token
+        if not token:
+            break
+
+
+def _newest_first(versions: list) -> list:
+    """
+    Order model versions from newest to oldest.
+
+    Version numbers are parsed once up front (decorate-sort-undecorate).
+
+    Args:
+        versions: Model versions to order
+
+    Returns:
+        New list of the versions, highest version number first
+    """
+    keyed = [(int(v.version), v) for v in versions]
+    keyed.sort(key=itemgetter(0), reverse=True)
+    return [v for _, v in keyed]
+
+
+def _versions_by_name(
+    client: MlflowClient, filter_string: str = "", page_size: int = 200
+) -> dict:
+    """
+    Fetch model versions page by page, bucketed by model name.
+
+    Args:
+        client: MLflow tracking client
+        filter_string: Optional search filter (empty = all versions)
+        page_size: Number of versions to request per page
+
+    Returns:
+        Dictionary mapping registered model name to its list of versions
+    """
+    by_name = {}
+    token = None
+    while True:
+        page = client.search_model_versions(
+            filter_string, max_results=page_size, page_token=token
+        )
+        for v in page:
+            by_name.setdefault(v.name, []).append(v)
+        token = page.token
+        if not token:
+            break
+    return by_name
+
+
+def promote_model(model_name: str, version: str = None, versions: list = None):
     """
     Promote a model version to Production stage.
 
     Args:
         model_name: Name of the registered model
         version: Version number (optional, defaults to latest)
+        versions: Already-fetched versions of the model (optional)
     """
     # Set tracking URI
     mlflow.set_tracking_uri("mlruns")
@@ -43,19 +108,18 @@ def promote_model(model_name: str, version: str = None):
     print(f"🔍 Looking for model: {model_name}")
 
     try:
-        # Get model versions
-        all_versions = client.search_model_versions(f"name='{model_name}'")
+        # Get model versions (reuse the caller's lookup when available)
+        if versions is None:
+            versions = client.search_model_versions(f"name='{model_name}'")
+        all_versions = versions
 
         if not all_versions:
             print(f"❌ No versions found for model '{model_name}'")
             print("\nAvailable models:")
-            for rm in client.search_registered_models():
+            for rm in _iter_registered_models(client):
                 print(f"  - {rm.name}")
             return False
 
-        # Sort by version number
-        all_versions.sort(key=lambda x: int(x.version), reverse=True)
-
         # Select version
         if version:
             target_version = version
@@ -63,11 +127,12 @@ def promote_model(model_name: str, version: str = None):
             if not version_obj:
                 print(f"❌ Version {version} not found for model '{model_name}'")
                 print("\nAvailable versions:")
-                for v in all_versions:
+                for v in _newest_first(all_versions):
                     print(f"  - Version {v.version} (Stage: {v.current_stage})")
                 return False
         else:
-            version_obj = all_versions[0]
+            # Only the latest is needed, so a linear max() instead of a full sort
+            version_obj = max(all_versions, key=lambda x: int(x.version))
             target_version = version_obj.version
 
         print(f"✅ Found version {target_version}")
@@ -78,24 +143,51 @@ def promote_model(model_name: str, version: str = None):
             print(f"ℹ️  Version {target_version} is already in Production stage")
             return True
 
+        return _promote(client, model_name, all_versions, target_version)
+
+    except Exception as e:
+        print(f"❌ Error: {type(e).__name__}: {e}")
+        return False
+
+
+def _promote(
+    client: MlflowClient, model_name: str, versions: list, target_version: str
+):
+    """
+    Archive current Production versions and promote the target version.
+
+    Args:
+        client: MLflow tracking client
+        model_name: Name of the registered model
+        versions: All versions of the model, as already fetched by the caller
+        target_version: Version number to promote
+    """
+    try:
         # Archive existing Production versions
         print("\n📦 Checking for existing Production versions...")
-        production_versions = client.get_latest_versions(
-            model_name, stages=["Production"]
-        )
-
-        for pv in production_versions:
-            print(f"   Archiving version {pv.version}...")
-            try:
-                client.transition_model_version_stage(
+        production_versions = [v for v in versions if v.current_stage == "Production"]
+
+        # Issue the archive requests concurrently rather than one round-trip each
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            futures = {}
+            for pv in production_versions:
+                print(f"   Archiving version {pv.version}...")
+                future = ex.submit(
+                    client.transition_model_version_stage,
                     name=model_name,
                     version=pv.version,
                     stage="Archived",
                     archive_existing_versions=False,
                 )
-                print(f"   ✅ Version {pv.version} archived")
-            except Exception as e:
-                print(f"   ⚠️  Could not archive version {pv.version}: {e}")
+                futures[future] = pv
+
+            for future in as_completed(futures):
+                pv = futures[future]
+                try:
+                    future.result()
+                    print(f"   ✅ Version {pv.version} archived")
+                except Exception as e:
+                    print(f"   ⚠️  Could not archive version {pv.version}: {e}")
 
         # Promote to Production - Method 1: Standard API
         print(f"\n🚀 Promoting version {target_version} to Production...")
@@ -169,20 +261,21 @@ def cleanup_old_versions(model_name: str = None, keep_last: int = 3):
         # Get models to clean
         if model_name:
             models = [
-                rm for rm in client.search_registered_models() if rm.name == model_name
+                rm for rm in _iter_registered_models(client) if rm.name == model_name
             ]
             if not models:
                 print(f"❌ Model '{model_name}' not found")
                 return False
+            by_name = _versions_by_name(client, f"name='{model_name}'")
         else:
-            models = client.search_registered_models()
+            models = _iter_registered_models(client)
+            by_name = _versions_by_name(client)
 
         for model in models:
             print(f"\n📦 Processing {model.name}...")
 
             # Get all versions
-            versions = client.search_model_versions(f"name='{model.name}'")
-            versions.sort(key=lambda x: int(x.version), reverse=True)
+            versions = _newest_first(by_name.get(model.name, []))
 
             # Keep Production and recent versions
             versions_to_delete = []
@@ -200,12 +293,22 @@ def cleanup_old_versions(model_name: str = None, keep_last: int = 3):
             # Delete old versions
             if versions_to_delete:
                 print(f"   🗑️  Deleting {len(versions_to_delete)} old versions...")
-                for v in versions_to_delete:
-                    try:
-                        client.delete_model_version(name=model.name, version=v.version)
-                        print(f"      ✅ Deleted Version {v.version}")
-                    except Exception as e:
-                        print(f"      ❌ Failed to delete Version {v.version}: {e}")
+                with ThreadPoolExecutor(max_workers=8) as ex:
+                    futures = {
+                        ex.submit(
+                            client.delete_model_version,
+                            name=model.name,
+                            version=v.version,
+                        ): v
+                        for v in versions_to_delete
+                    }
+                    for future in as_completed(futures):
+                        v = futures[future]
+                        try:
+                            future.result()
+                            print(f"      ✅ Deleted Version {v.version}")
+                        except Exception as e:
+                            print(f"      ❌ Failed to delete Version {v.version}: {e}")
             else:
                 print("   ℹ️  No old versions to delete")
 
@@ -225,18 +328,15 @@ def list_models():
     print("📋 Registered Models:")
     print("=" * 80)
 
-    models = client.search_registered_models()
+    by_name = _versions_by_name(client)
+    found = False
 
-    if not models:
-        print("No models found in registry.")
-        return
-
-    for model in models:
+    for model in _iter_registered_models(client):
+        found = True
         print(f"\n📦 {model.name}")
 
         # Get versions
-        versions = client.search_model_versions(f"name='{model.name}'")
-        versions.sort(key=lambda x: int(x.version), reverse=True)
+        versions = _newest_first(by_name.get(model.name, []))
 
         for v in versions:
             stage_emoji = "🏆" if v.current_stage == "Production" else "📌"
@@ -247,6 +347,9 @@ def list_models():
                 for key, value in v.tags.items():
                     print(f"      Tag: {key} = {value}")
 
+    if not found:
+        print("No models found in registry.")
+
 
 def find_and_promote_best():
     """Find the model tagged as best and promote it."""
@@ -256,42 +359,39 @@ def find_and_promote_best():
     print("🔍 Searching for best model...")
 
     try:
-        # Get all registered models
-        models = client.search_registered_models()
+        # One registry query for every version, instead of one per model
+        by_name = _versions_by_name(client)
+
+        # Look for the version tagged best_model=true with the highest ROC-AUC;
+        # versions without a positive ROC-AUC tag never count as best
+        tagged = (
+            v
+            for versions in by_name.values()
+            for v in versions
+            if v.tags
+            and v.tags.get("best_model") == "true"
+            and float(v.tags.get("roc_auc", 0.0)) > 0.0
+        )
+        best = max(
+            tagged, key=lambda v: float(v.tags.get("roc_auc", 0.0)), default=None
+        )
 
-        if not models:
+        if best is not None:
+            best_roc_auc = float(best.tags.get("roc_auc", 0.0))
+            print(
+                f"✅ Found best model: {best.name} v{best.version} (ROC-AUC: {best_roc_auc:.4f})"
+            )
+            return promote_model(best.name, best.version, by_name[best.name])
+
+        first_model = next(_iter_registered_models(client), None)
+        if first_model is None:
             print("❌ No models found in registry")
             return False
 
-        # Look for model with best_model=true tag
-        best_model = None
-        best_version = None
-        best_roc_auc = 0.0
-
-        for model in models:
-            # Get all versions
-            versions = client.search_model_versions(f"name='{model.name}'")
-
-            for v in versions:
-                # Check if this version has best_model tag
-                if v.tags and v.tags.get("best_model") == "true":
-                    roc_auc = float(v.tags.get("roc_auc", 0.0))
-                    if roc_auc > best_roc_auc:
-                        best_model = model.name
-                        best_version = v.version
-                        best_roc_auc = roc_auc
-
-        if best_model:
-            print(
-                f"✅ Found best model: {best_model} v{best_version} (ROC-AUC: {best_roc_auc:.4f})"
-            )
-            return promote_model(best_model, best_version)
-        else:
-            print("⚠️  No model found with 'best_model=true' tag")
-            print("   Promoting latest version of first model...")
-            # Fallback: promote latest version of first model
-            first_model = models[0].name
-            return promote_model(first_model)
+        print("⚠️  No model found with 'best_model=true' tag")
+        print("   Promoting latest version of first model...")
+        # Fallback: promote latest version of first model
+        return promote_model(first_model.name, versions=by_name.get(first_model.name))
 
     except Exception as e:
         print(f"❌ Error finding best model: {e}")
@@ -8,12 +8,12 @@ Usage:
 """
 
 import argparse
+import os
 import sys
-from pathlib import Path
 
 # Add project root to path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
 
 from src.models.train import train_all_models  # noqa: E402
 
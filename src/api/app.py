@@ -5,25 +5,30 @@ Endpoints:
 - GET /health: Health check
 - GET /: API info
 - POST /predict: Make prediction
+- POST /predict/batch: Make predictions for multiple patients
 - GET /metrics: Prometheus metrics
 """
 
+import os
 import sys
+import contextlib
 import time
 import logging
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timezone
+from typing import List, Optional
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Request
+import anyio.to_thread
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from starlette.responses import Response
 
 # Add project root to path for imports
-project_root = Path(__file__).parent.parent.parent
-sys.path.insert(0, str(project_root))
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, _ROOT)
 
 from src.models.predict import HeartDiseasePredictor, FEATURE_SCHEMA  # noqa: E402
 
@@ -44,27 +49,76 @@ PREDICTION_LATENCY = Histogram(
 REQUEST_COUNT = Counter(
     "request_count_total", "Total request count", ["method", "endpoint", "status"]
 )
+PREDICTION_CACHE = Counter("prediction_cache", "Prediction cache lookups", ["result"])
+
+# Pre-bound children for constant label values, so the hot path skips the
+# labels() lookup
+PREDICTIONS_DISEASE = PREDICTIONS_TOTAL.labels(result="disease")
+PREDICTIONS_NO_DISEASE = PREDICTIONS_TOTAL.labels(result="no_disease")
+PREDICTION_CACHE_HIT = PREDICTION_CACHE.labels(result="hit")
+PREDICTION_CACHE_MISS = PREDICTION_CACHE.labels(result="miss")
+
+# REQUEST_COUNT children by (method, endpoint, status), bound on first use
+_request_counters = {}
+
+# Candidate (model, preprocessor) artifact locations, in order of preference
+MODEL_PATHS = [
+    ("models/best_model.joblib", "models/preprocessing_pipeline.joblib"),
+    ("/app/models/best_model.joblib", "/app/models/preprocessing_pipeline.joblib"),
+]
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the predictor once per worker process and release it on shutdown."""
+    # Sync endpoints run in anyio's worker threads; size the pool for load
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+    app.state.predictor = _load_predictor()
+    yield
+    app.state.predictor = None
+
 
 # Initialize FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title="Heart Disease Prediction API",
     description="ML-powered API to predict heart disease risk based on patient health data",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
 )
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Add CORS middleware for the origins in CORS_ALLOW_ORIGINS (comma-separated,
+# default "*"); an empty value disables CORS handling entirely. The API uses
+# no cookies or auth headers, so credentials are only allowed for explicit
+# origins, which avoids reflecting arbitrary origins back to callers.
+CORS_ALLOW_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("CORS_ALLOW_ORIGINS", "*").split(",")
+    if origin.strip()
+]
+if CORS_ALLOW_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ALLOW_ORIGINS,
+        allow_credentials="*" not in CORS_ALLOW_ORIGINS,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+# Predictor of this worker process, set by lifespan (None until loaded)
+app.state.predictor = None
 
-# Global predictor instance
-predictor: Optional[HeartDiseasePredictor] = None
+# Worker threads available to sync endpoints (Starlette's default is 40)
+THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", "100"))
+
+# Distinct inputs kept in the predictor's LRU cache (0 disables it)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+
+# Most patients accepted in one /predict/batch request
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
 
 
 class PatientFeatures(BaseModel):
@@ -119,6 +173,14 @@ class PatientFeatures(BaseModel):
         }
 
 
+class BatchPatientFeatures(BaseModel):
+    """Input schema for batch predictions."""
+
+    instances: List[PatientFeatures] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_SIZE, description="Patients to predict"
+    )
+
+
 class PredictionResponse(BaseModel):
     """Output schema for predictions."""
 
@@ -132,6 +194,14 @@ class PredictionResponse(BaseModel):
     timestamp: str = Field(..., description="Prediction timestamp")
 
 
+class BatchPredictionResponse(BaseModel):
+    """Output schema for batch predictions."""
+
+    predictions: List[PredictionResponse] = Field(
+        ..., description="Predictions, in the same order as the input instances"
+    )
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
 
@@ -142,53 +212,122 @@ class HealthResponse(BaseModel):
     timestamp: str
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Load model on startup."""
-    global predictor
+# (epoch second, ISO 8601 string) of the most recent timestamp; replaced as
+# a whole so readers in other threads never see a mismatched pair
+_timestamp_cache = (0, "")
+
+
+def _utc_timestamp() -> str:
+    """Return the current UTC time in ISO 8601, formatted once per second."""
+    global _timestamp_cache
+    second = time.time_ns() // 1_000_000_000
+    cached_second, formatted = _timestamp_cache
+    if second != cached_second:
+        formatted = datetime.fromtimestamp(second, timezone.utc).isoformat()
+        _timestamp_cache = (second, formatted)
+    return formatted
+
+
+def _record_cache_lookup(hit: bool):
+    """Count a prediction cache lookup."""
+    (PREDICTION_CACHE_HIT if hit else PREDICTION_CACHE_MISS).inc()
+
+
+def _load_predictor() -> Optional[HeartDiseasePredictor]:
+    """
+    Load and warm up the predictor from the first available MODEL_PATHS entry.
+
+    Returns:
+        The predictor, or None if no artifacts were found or loading failed
+    """
     try:
-        # Try different paths for model loading
-        model_paths = [
-            ("models/best_model.joblib", "models/preprocessing_pipeline.joblib"),
-            (
-                "/app/models/best_model.joblib",
-                "/app/models/preprocessing_pipeline.joblib",
-            ),
-        ]
-
-        for model_path, pipeline_path in model_paths:
+        for model_path, pipeline_path in MODEL_PATHS:
             if Path(model_path).exists() and Path(pipeline_path).exists():
-                predictor = HeartDiseasePredictor(model_path, pipeline_path)
+                loaded = HeartDiseasePredictor(
+                    model_path,
+                    pipeline_path,
+                    cache_size=PREDICTION_CACHE_SIZE,
+                    cache_listener=_record_cache_lookup,
+                )
                 logger.info(f"Model loaded successfully from {model_path}")
-                return
+
+                # Pay lazy initialization costs before the first request;
+                # /health reports degraded until the predictor is published
+                try:
+                    latencies = loaded.warmup()
+                    logger.info(
+                        f"Warmup done: first={latencies[0] * 1000:.2f}ms "
+                        f"last={latencies[-1] * 1000:.2f}ms"
+                    )
+                except Exception as e:
+                    logger.warning(f"Warmup failed: {e}")
+
+                return loaded
 
         logger.warning(
             "Model not found. API will return errors until model is available."
         )
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
+    return None
+
+
+async def get_predictor(request: Request) -> Optional[HeartDiseasePredictor]:
+    """
+    Dependency returning this worker's predictor (None if not loaded).
+
+    Declared async so resolving it does not cost a threadpool hop. It does
+    not raise itself: FastAPI resolves dependencies before reporting body
+    validation errors, and invalid input must still get a 422 when no model
+    is loaded.
+    """
+    return request.app.state.predictor
+
+
+def _require_predictor(predictor: Optional[HeartDiseasePredictor]):
+    """Fail with 503 if no model is loaded."""
+    if predictor is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded. Please ensure model artifacts are available.",
+        )
+
+
+# High-frequency monitoring endpoints skipped by log_requests
+_UNTRACKED_PATHS = frozenset(("/metrics", "/health"))
 
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Middleware to log all requests."""
+    # Scrapes and liveness probes are neither logged nor counted
+    if request.url.path in _UNTRACKED_PATHS:
+        return await call_next(request)
+
     start_time = time.time()
 
     response = await call_next(request)
 
     process_time = time.time() - start_time
 
-    # Log request
+    # Log request (arguments are only formatted if INFO is enabled)
     logger.info(
-        f"{request.method} {request.url.path} "
-        f"status={response.status_code} "
-        f"duration={process_time:.3f}s"
+        "%s %s status=%s duration=%.3fs",
+        request.method,
+        request.url.path,
+        response.status_code,
+        process_time,
     )
 
-    # Update metrics
-    REQUEST_COUNT.labels(
-        method=request.method, endpoint=request.url.path, status=response.status_code
-    ).inc()
+    # Update metrics, labelled by route template so that path parameters
+    # and unknown URLs cannot grow the label set without bound
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else "unmatched"
+    key = (request.method, endpoint, response.status_code)
+    counter = _request_counters.get(key)
+    if counter is None:
+        counter = _request_counters[key] = REQUEST_COUNT.labels(*key)
+    counter.inc()
 
     return response
 
@@ -203,6 +342,7 @@ async def root():
         "endpoints": {
             "/health": "Health check",
             "/predict": "Make prediction (POST)",
+            "/predict/batch": "Make predictions for multiple patients (POST)",
             "/docs": "API documentation",
             "/metrics": "Prometheus metrics",
         },
@@ -210,33 +350,37 @@ async def root():
 
 
 @app.get("/health", response_model=HealthResponse, tags=["Health"])
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint."""
+    model_loaded = request.app.state.predictor is not None
     return HealthResponse(
-        status="healthy" if predictor is not None else "degraded",
-        model_loaded=predictor is not None,
-        timestamp=datetime.utcnow().isoformat(),
+        status="healthy" if model_loaded else "degraded",
+        model_loaded=model_loaded,
+        timestamp=_utc_timestamp(),
     )
 
 
 @app.post("/predict", response_model=PredictionResponse, tags=["Prediction"])
-async def predict(features: PatientFeatures):
+def predict(
+    features: PatientFeatures,
+    predictor: Optional[HeartDiseasePredictor] = Depends(get_predictor),
+):
     """
     Make a heart disease prediction.
 
     Accepts patient health features and returns prediction with probability scores.
+    Declared sync so the CPU-bound model call runs in the threadpool instead
+    of blocking the event loop.
     """
-    if predictor is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Model not loaded. Please ensure model artifacts are available.",
-        )
+    _require_predictor(predictor)
 
     try:
         start_time = time.time()
 
         # Convert to dict and predict
-        features_dict = features.model_dump()
+        # The validated field values live in the model's __dict__; reading
+        # them directly avoids model_dump's serialization pass
+        features_dict = vars(features)
         result = predictor.predict(features_dict)
 
         # Record latency
@@ -244,32 +388,80 @@ async def predict(features: PatientFeatures):
         PREDICTION_LATENCY.observe(latency)
 
         # Update prediction counter
-        label = "disease" if result["prediction"] == 1 else "no_disease"
-        PREDICTIONS_TOTAL.labels(result=label).inc()
+        if result["prediction"] == 1:
+            PREDICTIONS_DISEASE.inc()
+        else:
+            PREDICTIONS_NO_DISEASE.inc()
 
         # Log prediction
         logger.info(
-            f"Prediction: {result['prediction_label']} "
-            f"(confidence: {result['confidence']:.3f}, latency: {latency:.3f}s)"
+            "Prediction: %s (confidence: %.3f, latency: %.3fs)",
+            result["prediction_label"],
+            result["confidence"],
+            latency,
         )
 
-        return PredictionResponse(
-            prediction=result["prediction"],
-            prediction_label=result["prediction_label"],
-            probability_no_disease=result["probability_no_disease"],
-            probability_disease=result["probability_disease"],
-            confidence=result["confidence"],
-            timestamp=datetime.utcnow().isoformat(),
-        )
+        # The predictor already builds the response fields; returning the
+        # response directly skips re-validating them against response_model
+        result["timestamp"] = _utc_timestamp()
+        return ORJSONResponse(result)
 
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/predict/batch", response_model=BatchPredictionResponse, tags=["Prediction"])
+def predict_batch(
+    batch: BatchPatientFeatures,
+    predictor: Optional[HeartDiseasePredictor] = Depends(get_predictor),
+):
+    """
+    Make heart disease predictions for multiple patients.
+
+    The whole batch is preprocessed and scored in a single model call.
+    """
+    _require_predictor(predictor)
+
+    try:
+        start_time = time.time()
+
+        features_list = [vars(features) for features in batch.instances]
+        results = predictor.predict_batch(features_list)
+
+        # Record latency
+        latency = time.time() - start_time
+        PREDICTION_LATENCY.observe(latency)
+
+        # Update prediction counters once per batch
+        n_disease = sum(result["prediction"] == 1 for result in results)
+        if n_disease:
+            PREDICTIONS_DISEASE.inc(n_disease)
+        if n_disease < len(results):
+            PREDICTIONS_NO_DISEASE.inc(len(results) - n_disease)
+
+        # Log batch
+        logger.info(
+            "Batch prediction: %d patients (latency: %.3fs)", len(results), latency
+        )
+
+        timestamp = _utc_timestamp()
+        for result in results:
+            result["timestamp"] = timestamp
+        return ORJSONResponse({"predictions": results})
+
+    except Exception as e:
+        logger.error(f"Batch prediction error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/metrics", tags=["Monitoring"])
-async def metrics():
-    """Prometheus metrics endpoint."""
+def metrics():
+    """
+    Prometheus metrics endpoint.
+
+    Declared sync so rendering the registry runs in the threadpool.
+    """
     return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
@@ -4,10 +4,21 @@ Prediction module for Heart Disease classification.
 Provides functions to load the model and make predictions.
 """
 
+import functools
+import math
+import threading
+import time
+import warnings
+
 import joblib
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Dict, Union, List
+from scipy.special import expit
+from sklearn.linear_model import LogisticRegression
+from typing import Callable, Dict, Union, List, Optional
+
+from src.data.pipeline import freeze_preprocessor, load_fused_preprocessor
 
 
 class HeartDiseasePredictor:
@@ -17,6 +28,8 @@ class HeartDiseasePredictor:
         self,
         model_path: str = "models/best_model.joblib",
         pipeline_path: str = "models/preprocessing_pipeline.joblib",
+        cache_size: int = 4096,
+        cache_listener: Optional[Callable[[bool], None]] = None,
     ):
         """
         Initialize the predictor.
@@ -24,22 +37,143 @@ class HeartDiseasePredictor:
         Args:
             model_path: Path to the saved model
             pipeline_path: Path to the preprocessing pipeline
+            cache_size: Number of distinct inputs whose predictions are kept
+                in an LRU cache (0 disables caching)
+            cache_listener: Optional callback invoked by predict with True on
+                a cache hit and False on a miss
         """
         self.model_path = Path(model_path)
         self.pipeline_path = Path(pipeline_path)
         self.model = None
         self.preprocessor = None
+        self._fused = None
+        self._folded = None
+        self.feature_order = list(FEATURE_ORDER)
+        self._local = threading.local()
+        self._coef = None
+        self._intercept = None
         self._load_artifacts()
 
+        # Per-instance LRU over feature tuples; only misses reach _predict_key
+        self.cache_listener = cache_listener
+        self._predict_cached = functools.lru_cache(maxsize=cache_size)(
+            self._predict_key
+        )
+
     def _load_artifacts(self):
-        """Load model and preprocessor from disk."""
+        """
+        Load model and preprocessor from disk.
+
+        A frozen preprocessor export (.npz) is preferred over unpickling the
+        sklearn pipeline: pipeline_path may point at the .npz directly, and
+        a .npz written next to the joblib pipeline by training is used only
+        if it was frozen from that exact file.
+        """
+        fused_path = self.pipeline_path.with_suffix(".npz")
         if not self.model_path.exists():
             raise FileNotFoundError(f"Model not found: {self.model_path}")
         if not self.pipeline_path.exists():
             raise FileNotFoundError(f"Preprocessor not found: {self.pipeline_path}")
 
-        self.model = joblib.load(self.model_path)
-        self.preprocessor = joblib.load(self.pipeline_path)
+        # Memory-map the numpy arrays inside the pickles: workers loading the
+        # same file share one copy through the page cache. The files must stay
+        # on disk while the process is running.
+        self.model = joblib.load(self.model_path, mmap_mode="r")
+
+        if self.pipeline_path.suffix == ".npz":
+            self._fused = load_fused_preprocessor(str(self.pipeline_path))
+        elif fused_path.exists():
+            try:
+                self._fused = load_fused_preprocessor(
+                    str(fused_path), source_path=str(self.pipeline_path)
+                )
+            except ValueError as e:
+                warnings.warn(f"Ignoring stale preprocessor export: {e}")
+
+        if self._fused is None:
+            self.preprocessor = joblib.load(self.pipeline_path, mmap_mode="r")
+
+            # Flatten the fitted pipeline into NumPy arrays; pipelines with an
+            # unsupported structure keep going through sklearn
+            try:
+                self._fused = freeze_preprocessor(self.preprocessor)
+            except (ValueError, AttributeError, KeyError):
+                self._fused = None
+
+        # Column order the preprocessor was fitted with
+        if self._fused is not None:
+            self.feature_order = list(self._fused.columns)
+        elif hasattr(self.preprocessor, "feature_names_in_"):
+            self.feature_order = list(self.preprocessor.feature_names_in_)
+
+        # Binary logistic regression is scored directly from its weights,
+        # skipping sklearn's per-call input validation
+        if isinstance(self.model, LogisticRegression) and len(self.model.classes_) == 2:
+            self._coef = np.ascontiguousarray(self.model.coef_.ravel())
+            self._intercept = float(self.model.intercept_[0])
+
+            # With a fused preprocessor, fold scaling and one-hot encoding
+            # into the weights and score raw feature rows directly
+            if self._fused is not None:
+                self._folded = self._fused.fold_linear(self._coef, self._intercept)
+
+    def _score(self, X: np.ndarray):
+        """
+        Score a preprocessed feature matrix.
+
+        Labels are derived from the probabilities (argmax over classes_, the
+        same rule sklearn's predict uses), so the model is evaluated once.
+
+        Args:
+            X: Preprocessed feature matrix
+
+        Returns:
+            Tuple of (predicted labels, class probabilities)
+        """
+        if self._coef is not None:
+            return self._from_logits(X @ self._coef + self._intercept)
+        probabilities = self.model.predict_proba(X)
+        predictions = self.model.classes_[probabilities.argmax(axis=1)]
+        return predictions, probabilities
+
+    def _from_logits(self, logits: np.ndarray):
+        """Turn binary logistic decision values into (labels, probabilities)."""
+        p = expit(logits)
+        probabilities = np.column_stack((1.0 - p, p))
+        predictions = self.model.classes_[probabilities.argmax(axis=1)]
+        return predictions, probabilities
+
+    def _predict_rows(self, X: np.ndarray):
+        """
+        Preprocess and score raw feature rows (columns in feature_order).
+
+        Args:
+            X: Raw feature matrix
+
+        Returns:
+            Tuple of (predicted labels, class probabilities)
+        """
+        if self._folded is not None:
+            return self._from_logits(self._folded.decision_function(X))
+        return self._score(self._transform(X))
+
+    def _to_frame(self, X: np.ndarray) -> pd.DataFrame:
+        """Wrap a feature matrix (in feature_order) for the preprocessor."""
+        return pd.DataFrame(X, columns=self.feature_order, copy=False)
+
+    def _transform(self, X: np.ndarray) -> np.ndarray:
+        """Preprocess a raw feature matrix (columns in feature_order)."""
+        if self._fused is not None:
+            return self._fused.transform(X)
+        return self.preprocessor.transform(self._to_frame(X))
+
+    def _row_buffer(self) -> np.ndarray:
+        """Return this thread's preallocated (1, n_features) input row."""
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = np.empty((1, len(self.feature_order)), dtype=np.float64)
+            self._local.row = row
+        return row
 
     def predict(self, features: Dict[str, Union[int, float]]) -> Dict[str, any]:
         """
@@ -53,25 +187,72 @@ class HeartDiseasePredictor:
         Returns:
             Dictionary with prediction and probability
         """
-        # Convert to DataFrame
-        df = pd.DataFrame([features])
+        key = tuple(features[name] for name in self.feature_order)
 
-        # Preprocess
-        X = self.preprocessor.transform(df)
+        self._local.miss = False
+        result = self._predict_cached(key)
+        if self.cache_listener is not None:
+            self.cache_listener(not self._local.miss)
 
-        # Predict
-        prediction = self.model.predict(X)[0]
-        probability = self.model.predict_proba(X)[0]
-
-        return {
-            "prediction": int(prediction),
-            "prediction_label": (
-                "Heart Disease" if prediction == 1 else "No Heart Disease"
-            ),
-            "probability_no_disease": float(probability[0]),
-            "probability_disease": float(probability[1]),
-            "confidence": float(max(probability)),
-        }
+        # Cached results are shared, hand out a copy
+        return dict(result)
+
+    def _predict_key(self, key: tuple) -> Dict[str, any]:
+        """
+        Run the model for one patient given as a tuple in feature_order.
+
+        Args:
+            key: Feature values in feature_order
+
+        Returns:
+            Dictionary with prediction and probability
+        """
+        self._local.miss = True
+
+        # Single rows of a folded logistic regression are scored with plain
+        # Python floats, which beats dispatching NumPy kernels on 13 values
+        if self._folded is not None:
+            p = _sigmoid(self._folded.decision_one(key))
+            probability = (1.0 - p, p)
+            prediction = self.model.classes_[1 if p > 1.0 - p else 0]
+            return _format_result(prediction, probability)
+
+        # Fill the preallocated row in the fitted column order, skipping
+        # per-request dict parsing and dtype inference in pandas
+        row = self._row_buffer()
+        row[0, :] = key
+
+        # Preprocess and predict
+        predictions, probabilities = self._predict_rows(row)
+
+        return _format_result(predictions[0], probabilities[0])
+
+    def warmup(
+        self, features: Optional[Dict[str, Union[int, float]]] = None, n_runs: int = 3
+    ) -> List[float]:
+        """
+        Run uncached predictions so lazy initialization happens before traffic.
+
+        Args:
+            features: Patient to score (defaults to SAMPLE_PATIENT)
+            n_runs: Number of predictions to run
+
+        Returns:
+            Latency of each run in seconds
+        """
+        features = SAMPLE_PATIENT if features is None else features
+        key = tuple(features[name] for name in self.feature_order)
+
+        latencies = []
+        for _ in range(n_runs):
+            start_time = time.perf_counter()
+            self._predict_key(key)
+            latencies.append(time.perf_counter() - start_time)
+        return latencies
+
+    def cache_info(self):
+        """Return hit/miss statistics of the prediction cache."""
+        return self._predict_cached.cache_info()
 
     def predict_batch(
         self, features_list: List[Dict[str, Union[int, float]]]
@@ -79,13 +260,52 @@ class HeartDiseasePredictor:
         """
         Make predictions for multiple patients.
 
+        All patients are stacked into one matrix so the preprocessor and
+        model are each invoked once for the whole batch.
+
         Args:
             features_list: List of feature dictionaries
 
         Returns:
             List of prediction dictionaries
         """
-        return [self.predict(features) for features in features_list]
+        if not features_list:
+            return []
+
+        rows = np.array(
+            [
+                [features[key] for key in self.feature_order]
+                for features in features_list
+            ],
+            dtype=np.float64,
+        )
+        predictions, probabilities = self._predict_rows(rows)
+
+        return [
+            _format_result(prediction, probability)
+            for prediction, probability in zip(predictions, probabilities)
+        ]
+
+
+def _sigmoid(z: float) -> float:
+    """Logistic function on a Python float, without overflow for large |z|."""
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+
+def _format_result(prediction, probability) -> Dict[str, any]:
+    """Build the prediction dictionary for one patient."""
+    return {
+        "prediction": int(prediction),
+        "prediction_label": (
+            "Heart Disease" if prediction == 1 else "No Heart Disease"
+        ),
+        "probability_no_disease": float(probability[0]),
+        "probability_disease": float(probability[1]),
+        "confidence": float(max(probability)),
+    }
 
 
 # Feature schema for validation
@@ -155,6 +375,31 @@ FEATURE_SCHEMA = {
     "thal": {"type": "int", "min": 0, "max": 3, "description": "Thalassemia (0-3)"},
 }
 
+# Canonical feature order (matches the columns of the training data)
+FEATURE_ORDER = tuple(FEATURE_SCHEMA)
+
+# (name, min, max) per feature, so validation does no nested schema lookups
+_FEATURE_BOUNDS = tuple(
+    (key, schema["min"], schema["max"]) for key, schema in FEATURE_SCHEMA.items()
+)
+
+# Example patient, used for warmup and the command-line demo
+SAMPLE_PATIENT = {
+    "age": 63,
+    "sex": 1,
+    "cp": 3,
+    "trestbps": 145,
+    "chol": 233,
+    "fbs": 1,
+    "restecg": 0,
+    "thalach": 150,
+    "exang": 0,
+    "oldpeak": 2.3,
+    "slope": 0,
+    "ca": 0,
+    "thal": 1,
+}
+
 
 def validate_features(features: Dict[str, Union[int, float]]) -> List[str]:
     """
@@ -166,21 +411,19 @@ def validate_features(features: Dict[str, Union[int, float]]) -> List[str]:
     Returns:
         List of validation errors (empty if valid)
     """
-    errors = []
-
     # Check for missing features
-    for key in FEATURE_SCHEMA:
-        if key not in features:
-            errors.append(f"Missing required feature: {key}")
+    errors = [
+        f"Missing required feature: {key}"
+        for key in FEATURE_ORDER
+        if key not in features
+    ]
 
     # Check value ranges
-    for key, value in features.items():
-        if key in FEATURE_SCHEMA:
-            schema = FEATURE_SCHEMA[key]
-            if value < schema["min"] or value > schema["max"]:
-                errors.append(
-                    f"{key}: value {value} out of range [{schema['min']}, {schema['max']}]"
-                )
+    for key, low, high in _FEATURE_BOUNDS:
+        if key in features:
+            value = features[key]
+            if value < low or value > high:
+                errors.append(f"{key}: value {value} out of range [{low}, {high}]")
 
     return errors
 
@@ -190,21 +433,7 @@ if __name__ == "__main__":
     predictor = HeartDiseasePredictor()
 
     # Sample patient data
-    sample_patient = {
-        "age": 63,
-        "sex": 1,
-        "cp": 3,
-        "trestbps": 145,
-        "chol": 233,
-        "fbs": 1,
-        "restecg": 0,
-        "thalach": 150,
-        "exang": 0,
-        "oldpeak": 2.3,
-        "slope": 0,
-        "ca": 0,
-        "thal": 1,
-    }
+    sample_patient = SAMPLE_PATIENT
 
     # Validate
     errors = validate_features(sample_patient)
@@ -0,0 +1,279 @@
+"""
+Shared pytest fixtures.
+"""
+
+import pytest
+import joblib
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from pathlib import Path
+import sys
+
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+
+# Add project root to path once for every test module
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data.pipeline import (  # noqa: E402
+    load_config,
+    clean_data,
+    get_feature_target_split,
+    create_preprocessing_pipeline,
+)
+from src.models.predict import FEATURE_SCHEMA  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def sample_data():
+    """Create sample data for testing with enough samples for stratified split."""
+    # Create 20 samples (10 per class) to ensure stratified split works
+    return pd.DataFrame(
+        {
+            "age": [
+                63,
+                67,
+                37,
+                41,
+                56,
+                62,
+                57,
+                63,
+                53,
+                57,  # 10 samples
+                44,
+                52,
+                57,
+                54,
+                48,
+                49,
+                64,
+                58,
+                50,
+                66,
+            ],  # 10 more
+            "sex": [1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1, 1, 0, 1],
+            "cp": [3, 3, 2, 1, 1, 0, 2, 3, 2, 1, 2, 3, 0, 1, 2, 3, 0, 2, 1, 3],
+            "trestbps": [
+                145,
+                160,
+                130,
+                130,
+                120,
+                140,
+                120,
+                145,
+                125,
+                130,
+                128,
+                134,
+                120,
+                150,
+                130,
+                140,
+                120,
+                132,
+                142,
+                150,
+            ],
+            "chol": [
+                233,
+                286,
+                250,
+                204,
+                236,
+                268,
+                354,
+                254,
+                203,
+                192,
+                263,
+                234,
+                246,
+                239,
+                275,
+                266,
+                211,
+                224,
+                318,
+                226,
+            ],
+            "fbs": [1, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 1, 0, 0, 1, 0, 1, 0],
+            "restecg": [0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 0, 0, 1, 1, 0, 0, 1, 0, 0, 1],
+            "thalach": [
+                150,
+                108,
+                187,
+                172,
+                178,
+                160,
+                163,
+                147,
+                155,
+                165,
+                173,
+                158,
+                154,
+                160,
+                180,
+                171,
+                144,
+                165,
+                152,
+                144,
+            ],
+            "exang": [0, 1, 0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 0, 0, 1, 0, 0, 1, 0],
+            "oldpeak": [
+                2.3,
+                1.5,
+                3.5,
+                1.4,
+                0.8,
+                3.6,
+                0.6,
+                1.4,
+                3.1,
+                0.8,
+                0.0,
+                1.0,
+                1.4,
+                0.8,
+                0.0,
+                0.6,
+                1.8,
+                1.0,
+                2.8,
+                1.0,
+            ],
+            "slope": [0, 1, 0, 2, 2, 0, 2, 1, 0, 2, 2, 2, 1, 2, 2, 1, 1, 2, 1, 1],
+            "ca": [0, 3, 0, 0, 0, 2, 0, 1, 0, 0, 0, 0, 1, 0, 0, 2, 0, 0, 2, 0],
+            "thal": [1, 2, 2, 2, 2, 2, 2, 3, 3, 2, 3, 2, 2, 2, 3, 3, 3, 2, 2, 3],
+            "target": [
+                1,
+                2,
+                1,
+                0,
+                0,
+                1,
+                2,
+                1,
+                0,
+                0,  # 10 samples (5 class 0, 5 class 1/2)
+                1,
+                2,
+                1,
+                0,
+                0,
+                1,
+                2,
+                1,
+                0,
+                0,
+            ],  # 10 more (balanced)
+        }
+    )
+
+
+@pytest.fixture(scope="session")
+def config():
+    """Load test configuration."""
+    return {
+        "features": {
+            "numerical": ["age", "trestbps", "chol", "thalach", "oldpeak"],
+            "categorical": [
+                "sex",
+                "cp",
+                "fbs",
+                "restecg",
+                "exang",
+                "slope",
+                "ca",
+                "thal",
+            ],
+            "target": "target",
+        },
+        "data": {"test_size": 0.2, "random_state": 42},
+    }
+
+
+@pytest.fixture(scope="session")
+def real_config():
+    """Project config.yaml, parsed once per session (shared; do not modify)."""
+    config_path = project_root / "src" / "config" / "config.yaml"
+    if not config_path.exists():
+        pytest.skip("src/config/config.yaml not found")
+    return load_config(str(config_path))
+
+
+@pytest.fixture(scope="session")
+def cleaned_data(sample_data):
+    """Sample data passed through clean_data once (shared; do not modify)."""
+    return clean_data(sample_data)
+
+
+@pytest.fixture(scope="session")
+def processed_data(cleaned_data, config):
+    """Cleaned, preprocessed sample data, computed once per session.
+
+    Returns:
+        Tuple of (X_processed, y, fitted preprocessing pipeline)
+    """
+    X, y = get_feature_target_split(cleaned_data, config["features"]["target"])
+    pipeline = create_preprocessing_pipeline(
+        config["features"]["numerical"], config["features"]["categorical"]
+    )
+    return pipeline.fit_transform(X), y.values, pipeline
+
+
+@lru_cache(maxsize=None)
+def _cached_pipeline(numerical: tuple, categorical: tuple):
+    """Build one unfitted preprocessing pipeline per pair of column lists."""
+    return create_preprocessing_pipeline(list(numerical), list(categorical))
+
+
+@pytest.fixture
+def preprocessing_pipeline(config):
+    """Fresh unfitted preprocessing pipeline for the configured features."""
+    features = config["features"]
+    return clone(
+        _cached_pipeline(tuple(features["numerical"]), tuple(features["categorical"]))
+    )
+
+
+@pytest.fixture
+def patient_frame():
+    """Generate random patients within the feature schema ranges."""
+    rng = np.random.default_rng(42)
+    n_samples = 200
+
+    data = {}
+    for name, schema in FEATURE_SCHEMA.items():
+        if schema["type"] == "int":
+            data[name] = rng.integers(schema["min"], schema["max"] + 1, n_samples)
+        else:
+            data[name] = rng.uniform(schema["min"], schema["max"], n_samples).round(1)
+    return pd.DataFrame(data)
+
+
+@pytest.fixture
+def model_artifacts(tmp_path, patient_frame):
+    """Write a small model trained on random patients, plus its pipeline.
+
+    Returns:
+        Tuple of (model_path, pipeline_path)
+    """
+    numerical = ["age", "trestbps", "chol", "thalach", "oldpeak"]
+    categorical = ["sex", "cp", "fbs", "restecg", "exang", "slope", "ca", "thal"]
+    y = (patient_frame["age"] + 10 * patient_frame["cp"] > 75).astype(int)
+
+    preprocessor = create_preprocessing_pipeline(numerical, categorical)
+    X = preprocessor.fit_transform(patient_frame)
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+
+    model_path = tmp_path / "model.joblib"
+    pipeline_path = tmp_path / "pipeline.joblib"
+    joblib.dump(model, model_path)
+    joblib.dump(preprocessor, pipeline_path)
+    return model_path, pipeline_path
@@ -2,55 +2,101 @@
 Unit tests for the FastAPI application.
 """
 
+import json
+from datetime import datetime, timezone
+
 import pytest
 from fastapi.testclient import TestClient
-from pathlib import Path
-import sys
-
-# Add project root to path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
 
-from src.api.app import app  # noqa: E402
+import src.api.app as app_module
+from src.api.app import app, MAX_BATCH_SIZE
+from src.models.predict import HeartDiseasePredictor
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def client():
-    """Create test client."""
-    return TestClient(app)
+    """Create one test client, running app startup/shutdown once per session."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+VALID_PATIENT_DATA = {
+    "age": 63,
+    "sex": 1,
+    "cp": 3,
+    "trestbps": 145,
+    "chol": 233,
+    "fbs": 1,
+    "restecg": 0,
+    "thalach": 150,
+    "exang": 0,
+    "oldpeak": 2.3,
+    "slope": 0,
+    "ca": 0,
+    "thal": 1,
+}
+
+# Request bodies that never change, encoded once
+JSON_HEADERS = {"content-type": "application/json"}
+VALID_PATIENT_JSON = json.dumps(VALID_PATIENT_DATA).encode()
+BATCH_OF_THREE_JSON = json.dumps({"instances": [VALID_PATIENT_DATA] * 3}).encode()
+
+
+@pytest.fixture(scope="session")
+def valid_patient_data():
+    """Valid patient data for testing (shared; copy before modifying)."""
+    return VALID_PATIENT_DATA
+
+
+@pytest.fixture(scope="session")
+def cached_get(client):
+    """GET a path once per session and reuse the response.
+
+    Only for endpoints whose response does not depend on earlier requests;
+    /metrics changes as requests are counted and must be fetched directly.
+    """
+    responses = {}
+
+    def get(path):
+        if path not in responses:
+            responses[path] = client.get(path)
+        return responses[path]
+
+    return get
 
 
 @pytest.fixture
-def valid_patient_data():
-    """Valid patient data for testing."""
-    return {
-        "age": 63,
-        "sex": 1,
-        "cp": 3,
-        "trestbps": 145,
-        "chol": 233,
-        "fbs": 1,
-        "restecg": 0,
-        "thalach": 150,
-        "exang": 0,
-        "oldpeak": 2.3,
-        "slope": 0,
-        "ca": 0,
-        "thal": 1,
-    }
+def loaded_client(client, model_artifacts):
+    """Test client whose app serves a small model from tmp artifacts.
+
+    Returns:
+        Tuple of (client, separate predictor over the same artifacts)
+    """
+    model_path, pipeline_path = map(str, model_artifacts)
+    previous = app.state.predictor
+    app.state.predictor = HeartDiseasePredictor(model_path, pipeline_path)
+    try:
+        yield client, HeartDiseasePredictor(model_path, pipeline_path)
+    finally:
+        app.state.predictor = previous
+
+
+def assert_utc_timestamp(value):
+    """Assert that value is an ISO 8601 timestamp in UTC."""
+    assert datetime.fromisoformat(value).utcoffset() == timezone.utc.utcoffset(None)
 
 
 class TestHealthEndpoint:
     """Tests for health check endpoint."""
 
-    def test_health_endpoint_returns_200(self, client):
+    def test_health_endpoint_returns_200(self, cached_get):
         """Test that health endpoint returns 200."""
-        response = client.get("/health")
+        response = cached_get("/health")
         assert response.status_code == 200
 
-    def test_health_response_structure(self, client):
+    def test_health_response_structure(self, cached_get):
         """Test health response structure."""
-        response = client.get("/health")
+        response = cached_get("/health")
         data = response.json()
 
         assert "status" in data
@@ -58,17 +104,56 @@ class TestHealthEndpoint:
         assert "timestamp" in data
 
 
+class TestLifespan:
+    """Tests for loading the model at application startup."""
+
+    def test_startup_loads_model(
+        self, model_artifacts, monkeypatch, valid_patient_data
+    ):
+        """Test that startup loads the first available artifacts and serves them."""
+        model_path, pipeline_path = map(str, model_artifacts)
+        monkeypatch.setattr(
+            app_module,
+            "MODEL_PATHS",
+            [
+                ("missing/model.joblib", "missing/pipeline.joblib"),
+                (model_path, pipeline_path),
+            ],
+        )
+        expected = HeartDiseasePredictor(model_path, pipeline_path).predict(
+            valid_patient_data
+        )
+
+        # A session-wide client may share the app; restore its predictor after
+        previous = getattr(app.state, "predictor", None)
+        try:
+            with TestClient(app) as startup_client:
+                health = startup_client.get("/health").json()
+                response = startup_client.post(
+                    "/predict", content=VALID_PATIENT_JSON, headers=JSON_HEADERS
+                )
+        finally:
+            app.state.predictor = previous
+
+        assert health["status"] == "healthy"
+        assert health["model_loaded"] is True
+        assert response.status_code == 200
+        data = response.json()
+        assert_utc_timestamp(data.pop("timestamp"))
+        assert data == expected
+
+
 class TestRootEndpoint:
     """Tests for root endpoint."""
 
-    def test_root_endpoint_returns_200(self, client):
+    def test_root_endpoint_returns_200(self, cached_get):
         """Test that root endpoint returns 200."""
-        response = client.get("/")
+        response = cached_get("/")
         assert response.status_code == 200
 
-    def test_root_response_structure(self, client):
+    def test_root_response_structure(self, cached_get):
         """Test root response contains API info."""
-        response = client.get("/")
+        response = cached_get("/")
         data = response.json()
 
         assert "name" in data
@@ -79,14 +164,14 @@ class TestRootEndpoint:
 class TestSchemaEndpoint:
     """Tests for schema endpoint."""
 
-    def test_schema_endpoint_returns_200(self, client):
+    def test_schema_endpoint_returns_200(self, cached_get):
         """Test that schema endpoint returns 200."""
-        response = client.get("/schema")
+        response = cached_get("/schema")
         assert response.status_code == 200
 
-    def test_schema_contains_features(self, client):
+    def test_schema_contains_features(self, cached_get):
         """Test that schema contains all features."""
-        response = client.get("/schema")
+        response = cached_get("/schema")
         data = response.json()
 
         expected_features = [
@@ -123,45 +208,37 @@ class TestMetricsEndpoint:
         # Should contain Prometheus metrics
         assert b"request_count_total" in response.content or response.status_code == 200
 
+    def test_unknown_paths_share_one_label(self, client):
+        """Test that unmatched URLs do not create per-path metric labels."""
+        client.get("/no-such-page-12345")
+        response = client.get("/metrics")
+
+        assert b"/no-such-page-12345" not in response.content
+        assert b'endpoint="unmatched"' in response.content
+
+    def test_monitoring_requests_not_counted(self, client):
+        """Test that scrapes and health probes are not counted as requests."""
+        client.get("/health")
+        response = client.get("/metrics")
+
+        assert b'endpoint="/health"' not in response.content
+        assert b'endpoint="/metrics"' not in response.content
+
 
 class TestPredictEndpoint:
     """Tests for prediction endpoint."""
 
-    def test_predict_invalid_data_returns_422(self, client):
-        """Test that invalid data returns 422."""
-        invalid_data = {"age": "not_a_number"}
-        response = client.post("/predict", json=invalid_data)
-        assert response.status_code == 422
-
     def test_predict_missing_fields_returns_422(self, client):
         """Test that missing fields returns 422."""
         incomplete_data = {"age": 63, "sex": 1}
         response = client.post("/predict", json=incomplete_data)
         assert response.status_code == 422
 
-    def test_predict_out_of_range_returns_422(self, client):
-        """Test that out of range values return 422."""
-        invalid_data = {
-            "age": 200,  # Out of range
-            "sex": 1,
-            "cp": 3,
-            "trestbps": 145,
-            "chol": 233,
-            "fbs": 1,
-            "restecg": 0,
-            "thalach": 150,
-            "exang": 0,
-            "oldpeak": 2.3,
-            "slope": 0,
-            "ca": 0,
-            "thal": 1,
-        }
-        response = client.post("/predict", json=invalid_data)
-        assert response.status_code == 422
-
-    def test_predict_valid_data_response_structure(self, client, valid_patient_data):
+    def test_predict_valid_data_response_structure(self, client):
         """Test prediction response structure when model is loaded."""
-        response = client.post("/predict", json=valid_patient_data)
+        response = client.post(
+            "/predict", content=VALID_PATIENT_JSON, headers=JSON_HEADERS
+        )
 
         # If model is loaded, check response structure
         if response.status_code == 200:
@@ -176,35 +253,101 @@ class TestPredictEndpoint:
             # Model not loaded - should be 503
             assert response.status_code == 503
 
+    def test_predict_returns_model_output(self, loaded_client):
+        """Test the exact prediction body when a model is loaded."""
+        client, expected_predictor = loaded_client
+        response = client.post(
+            "/predict", content=VALID_PATIENT_JSON, headers=JSON_HEADERS
+        )
 
-class TestInputValidation:
-    """Tests for input validation via Pydantic."""
+        assert response.status_code == 200
+        data = response.json()
+        assert_utc_timestamp(data.pop("timestamp"))
+        assert data == expected_predictor.predict(VALID_PATIENT_DATA)
 
-    def test_age_validation(self, client, valid_patient_data):
-        """Test age field validation."""
-        # Negative age
-        data = valid_patient_data.copy()
-        data["age"] = -1
-        response = client.post("/predict", json=data)
+
+class TestBatchPredictEndpoint:
+    """Tests for batch prediction endpoint."""
+
+    def test_batch_empty_instances_returns_422(self, client):
+        """Test that an empty batch returns 422."""
+        response = client.post("/predict/batch", json={"instances": []})
         assert response.status_code == 422
 
-        # Age too high
-        data["age"] = 150
-        response = client.post("/predict", json=data)
+    def test_batch_invalid_instance_returns_422(self, client, valid_patient_data):
+        """Test that one invalid patient rejects the whole batch."""
+        invalid_data = valid_patient_data.copy()
+        invalid_data["age"] = 200
+        response = client.post(
+            "/predict/batch", json={"instances": [valid_patient_data, invalid_data]}
+        )
         assert response.status_code == 422
 
-    def test_sex_validation(self, client, valid_patient_data):
-        """Test sex field validation."""
-        data = valid_patient_data.copy()
-        data["sex"] = 2  # Should be 0 or 1
+    def test_batch_response_structure(self, client):
+        """Test batch response structure when model is loaded."""
+        response = client.post(
+            "/predict/batch", content=BATCH_OF_THREE_JSON, headers=JSON_HEADERS
+        )
+
+        # If model is loaded, check response structure
+        if response.status_code == 200:
+            data = response.json()
+            assert len(data["predictions"]) == 3
+            for prediction in data["predictions"]:
+                assert "prediction" in prediction
+                assert "probability_disease" in prediction
+                assert "timestamp" in prediction
+        else:
+            # Model not loaded - should be 503
+            assert response.status_code == 503
+
+    def test_batch_returns_model_output_in_order(self, loaded_client, patient_frame):
+        """Test the exact batch body, one result per patient in request order."""
+        client, expected_predictor = loaded_client
+        patients = patient_frame.head(8)
+        response = client.post(
+            "/predict/batch",
+            content=f'{{"instances": {patients.to_json(orient="records")}}}',
+            headers=JSON_HEADERS,
+        )
+
+        assert response.status_code == 200
+        predictions = response.json()["predictions"]
+        timestamps = {prediction.pop("timestamp") for prediction in predictions}
+        assert len(timestamps) == 1
+        assert_utc_timestamp(timestamps.pop())
+
+        expected = expected_predictor.predict_batch(patients.to_dict("records"))
+        assert predictions == expected
+        # Both classes appear, so a reordered batch could not match
+        assert {prediction["prediction"] for prediction in predictions} == {0, 1}
+
+
+class TestInputValidation:
+    """Tests for input validation via Pydantic."""
+
+    @pytest.mark.parametrize(
+        "patch",
+        [
+            {"age": "not_a_number"},
+            {"age": -1},
+            {"age": 150},
+            {"age": 200},
+            {"sex": 2},  # Should be 0 or 1
+            {"cp": 5},  # Should be 0-3
+        ],
+        ids=["age_type", "age_negative", "age_high", "age_out_of_range", "sex", "cp"],
+    )
+    def test_invalid_field_returns_422(self, client, valid_patient_data, patch):
+        """Test that an invalid value in one field returns 422."""
+        data = {**valid_patient_data, **patch}
         response = client.post("/predict", json=data)
         assert response.status_code == 422
 
-    def test_chest_pain_validation(self, client, valid_patient_data):
-        """Test chest pain type validation."""
-        data = valid_patient_data.copy()
-        data["cp"] = 5  # Should be 0-3
-        response = client.post("/predict", json=data)
+    def test_oversized_batch_returns_422(self, client, valid_patient_data):
+        """Test that a batch over MAX_BATCH_SIZE patients is rejected."""
+        instances = [valid_patient_data] * (MAX_BATCH_SIZE + 1)
+        response = client.post("/predict/batch", json={"instances": instances})
         assert response.status_code == 422
 
 
@@ -2,239 +2,98 @@
 Unit tests for data processing pipeline.
 """
 
-import pytest
 import pandas as pd
 import numpy as np
-from pathlib import Path
-import sys
-
-# Add project root to path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+import pytest
+from sklearn.linear_model import LogisticRegression
 
-from src.data.pipeline import (  # noqa: E402
-    load_config,
+from src.data.pipeline import (
+    _smallest_mode,
     clean_data,
     get_feature_target_split,
     create_preprocessing_pipeline,
+    freeze_preprocessor,
     split_data,
 )
 
-
-@pytest.fixture
-def sample_data():
-    """Create sample data for testing with enough samples for stratified split."""
-    # Create 20 samples (10 per class) to ensure stratified split works
-    return pd.DataFrame(
-        {
-            "age": [
-                63,
-                67,
-                37,
-                41,
-                56,
-                62,
-                57,
-                63,
-                53,
-                57,  # 10 samples
-                44,
-                52,
-                57,
-                54,
-                48,
-                49,
-                64,
-                58,
-                50,
-                66,
-            ],  # 10 more
-            "sex": [1, 1, 1, 0, 1, 1, 0, 1, 1, 1, 0, 1, 0, 1, 1, 0, 1, 1, 0, 1],
-            "cp": [3, 3, 2, 1, 1, 0, 2, 3, 2, 1, 2, 3, 0, 1, 2, 3, 0, 2, 1, 3],
-            "trestbps": [
-                145,
-                160,
-                130,
-                130,
-                120,
-                140,
-                120,
-                145,
-                125,
-                130,
-                128,
-                134,
-                120,
-                150,
-                130,
-                140,
-                120,
-                132,
-                142,
-                150,
-            ],
-            "chol": [
-                233,
-                286,
-                250,
-                204,
-                236,
-                268,
-                354,
-                254,
-                203,
-                192,
-                263,
-                234,
-                246,
-                239,
-                275,
-                266,
-                211,
-                224,
-                318,
-                226,
-            ],
-            "fbs": [1, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 1, 0, 0, 1, 0, 1, 0],
-            "restecg": [0, 0, 1, 0, 1, 1, 0, 0, 1, 1, 0, 0, 1, 1, 0, 0, 1, 0, 0, 1],
-            "thalach": [
-                150,
-                108,
-                187,
-                172,
-                178,
-                160,
-                163,
-                147,
-                155,
-                165,
-                173,
-                158,
-                154,
-                160,
-                180,
-                171,
-                144,
-                165,
-                152,
-                144,
-            ],
-            "exang": [0, 1, 0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 1, 0, 0, 1, 0, 0, 1, 0],
-            "oldpeak": [
-                2.3,
-                1.5,
-                3.5,
-                1.4,
-                0.8,
-                3.6,
-                0.6,
-                1.4,
-                3.1,
-                0.8,
-                0.0,
-                1.0,
-                1.4,
-                0.8,
-                0.0,
-                0.6,
-                1.8,
-                1.0,
-                2.8,
-                1.0,
-            ],
-            "slope": [0, 1, 0, 2, 2, 0, 2, 1, 0, 2, 2, 2, 1, 2, 2, 1, 1, 2, 1, 1],
-            "ca": [0, 3, 0, 0, 0, 2, 0, 1, 0, 0, 0, 0, 1, 0, 0, 2, 0, 0, 2, 0],
-            "thal": [1, 2, 2, 2, 2, 2, 2, 3, 3, 2, 3, 2, 2, 2, 3, 3, 3, 2, 2, 3],
-            "target": [
-                1,
-                2,
-                1,
-                0,
-                0,
-                1,
-                2,
-                1,
-                0,
-                0,  # 10 samples (5 class 0, 5 class 1/2)
-                1,
-                2,
-                1,
-                0,
-                0,
-                1,
-                2,
-                1,
-                0,
-                0,
-            ],  # 10 more (balanced)
-        }
-    )
-
-
-@pytest.fixture
-def config():
-    """Load test configuration."""
-    return {
-        "features": {
-            "numerical": ["age", "trestbps", "chol", "thalach", "oldpeak"],
-            "categorical": [
-                "sex",
-                "cp",
-                "fbs",
-                "restecg",
-                "exang",
-                "slope",
-                "ca",
-                "thal",
-            ],
-            "target": "target",
-        },
-        "data": {"test_size": 0.2, "random_state": 42},
-    }
+# Training rows selected by split_data(test_size=0.2, random_state=42) on the
+# 20-row sample data
+EXPECTED_TRAIN_ROWS = [0, 3, 12, 16, 7, 11, 5, 19, 4, 2, 17, 13, 6, 1, 14, 8]
 
 
 class TestDataLoading:
     """Tests for data loading functionality."""
 
-    def test_config_loading(self):
+    def test_config_loading(self, real_config):
         """Test that config can be loaded."""
-        config_path = project_root / "src" / "config" / "config.yaml"
-        if config_path.exists():
-            config = load_config(str(config_path))
-            assert "data" in config
-            assert "features" in config
-            assert "model" in config
+        assert "data" in real_config
+        assert "features" in real_config
+        assert "model" in real_config
 
 
 class TestDataCleaning:
     """Tests for data cleaning functionality."""
 
-    def test_clean_data_binary_target(self, sample_data):
+    def test_clean_data_binary_target(self, cleaned_data):
         """Test that target is converted to binary."""
-        cleaned = clean_data(sample_data)
-        assert cleaned["target"].isin([0, 1]).all()
+        assert cleaned_data["target"].isin([0, 1]).all()
 
     def test_clean_data_no_nulls(self, sample_data):
         """Test that cleaned data has no null values."""
-        # Add some nulls
-        sample_data.loc[0, "age"] = np.nan
-        cleaned = clean_data(sample_data)
+        # Add some nulls (to a copy; the fixture is shared)
+        data = sample_data.copy()
+        data.loc[0, "age"] = np.nan
+        cleaned = clean_data(data)
         assert cleaned.isnull().sum().sum() == 0
 
-    def test_clean_data_preserves_rows(self, sample_data):
+    def test_clean_data_preserves_rows(self, sample_data, cleaned_data):
         """Test that cleaning preserves most data."""
-        cleaned = clean_data(sample_data)
         # Should keep most rows (may drop some with NaN)
-        assert len(cleaned) >= len(sample_data) - 1
+        assert len(cleaned_data) >= len(sample_data) - 1
+
+    @pytest.mark.parametrize(
+        "values, expected",
+        [
+            ([2, 1, 2, 1, np.nan, 3], 1),  # tie between 1 and 2
+            ([-1, -1, 0, 2, 2], -1),  # negative codes, tie
+            ([0.5, 1.5, 0.5, 1.5, 2.0], 0.5),  # non-integer values
+            ([0, 0, 5_000_000, 5_000_000], 0),  # range too wide to bincount
+            ([np.nan, np.nan], 0),  # nothing to count
+        ],
+        ids=["tie", "negative", "non_integer", "wide_range", "all_nan"],
+    )
+    def test_smallest_mode(self, values, expected):
+        """Test that the mode ignores NaN and resolves ties to the smallest value."""
+        assert _smallest_mode(np.array(values, dtype=np.float64)) == expected
+
+    def test_clean_data_fills_categorical_with_mode(self, sample_data):
+        """Test that categorical gaps get the same fill as pandas' mode()."""
+        data = sample_data.copy()
+        categorical = ["sex", "cp", "fbs", "restecg", "exang", "slope", "ca", "thal"]
+        data.loc[[0, 5, 9], categorical] = np.nan
+        cleaned = clean_data(data)
+
+        assert len(cleaned) == len(data)
+        for col in categorical:
+            expected = data[col].mode()[0]
+            assert (cleaned.loc[[0, 5, 9], col] == expected).all(), col
+
+    def test_clean_data_fills_all_nan_categorical_with_zero(self, sample_data):
+        """Test that a categorical column with no values is filled with 0."""
+        data = sample_data.copy()
+        data["ca"] = np.nan
+        cleaned = clean_data(data)
+
+        assert len(cleaned) == len(data)
+        assert (cleaned["ca"] == 0).all()
 
 
 class TestFeatureEngineering:
     """Tests for feature engineering."""
 
-    def test_feature_target_split(self, sample_data, config):
+    def test_feature_target_split(self, cleaned_data, config):
         """Test feature-target splitting."""
-        cleaned = clean_data(sample_data)
-        X, y = get_feature_target_split(cleaned, config["features"]["target"])
+        X, y = get_feature_target_split(cleaned_data, config["features"]["target"])
 
         assert "target" not in X.columns
         assert len(y) == len(X)
@@ -246,41 +105,72 @@ class TestFeatureEngineering:
         )
         assert pipeline is not None
 
-    def test_preprocessing_pipeline_transform(self, sample_data, config):
+    def test_preprocessing_pipeline_transform(self, processed_data):
         """Test that preprocessing pipeline transforms data correctly."""
-        cleaned = clean_data(sample_data)
-        X, y = get_feature_target_split(cleaned, config["features"]["target"])
-
-        pipeline = create_preprocessing_pipeline(
-            config["features"]["numerical"], config["features"]["categorical"]
-        )
-
-        X_transformed = pipeline.fit_transform(X)
+        X_transformed, y, _ = processed_data
 
         # Check output is numpy array
         assert isinstance(X_transformed, np.ndarray)
         # Check no NaN values
         assert not np.isnan(X_transformed).any()
         # Check rows preserved
-        assert X_transformed.shape[0] == len(X)
+        assert X_transformed.shape[0] == len(y)
+
+    def test_frozen_preprocessor_matches_pipeline(
+        self, cleaned_data, config, preprocessing_pipeline
+    ):
+        """Test that the fused NumPy transform reproduces the sklearn output."""
+        X, y = get_feature_target_split(cleaned_data, config["features"]["target"])
+
+        pipeline = preprocessing_pipeline
+        expected = pipeline.fit_transform(X)
+
+        fused = freeze_preprocessor(pipeline)
+        raw = X[fused.columns].to_numpy(dtype=np.float64)
+        np.testing.assert_allclose(fused.transform(raw), expected)
+
+        # Missing values are imputed and unseen categories encode to zeros
+        raw[0, fused.num_idx[0]] = np.nan
+        raw[1, fused.cat_idx[0]] = 99
+        X_edge = pd.DataFrame(raw, columns=fused.columns)
+        np.testing.assert_allclose(fused.transform(raw), pipeline.transform(X_edge))
+
+    def test_folded_linear_matches_model(
+        self, cleaned_data, config, preprocessing_pipeline
+    ):
+        """Test that a folded linear model scores raw rows like sklearn."""
+        X, y = get_feature_target_split(cleaned_data, config["features"]["target"])
+
+        pipeline = preprocessing_pipeline
+        model = LogisticRegression().fit(pipeline.fit_transform(X), y)
+
+        fused = freeze_preprocessor(pipeline)
+        folded = fused.fold_linear(model.coef_, model.intercept_[0])
+        raw = X[fused.columns].to_numpy(dtype=np.float64)
+        raw[0, fused.num_idx[0]] = np.nan
+        raw[1, fused.cat_idx[0]] = 99
+        raw[2, fused.cat_idx[1]] = 0.5
+
+        expected = model.decision_function(
+            pipeline.transform(pd.DataFrame(raw, columns=fused.columns))
+        )
+        np.testing.assert_allclose(folded.decision_function(raw), expected)
+
+        # The scalar single-row path agrees with the vectorized one
+        single = [folded.decision_one(row) for row in raw.tolist()]
+        np.testing.assert_allclose(single, expected)
 
 
 class TestDataSplitting:
     """Tests for data splitting."""
 
-    def test_split_data_shapes(self, sample_data, config):
+    def test_split_data_shapes(self, processed_data, config):
         """Test that split data has correct shapes."""
-        cleaned = clean_data(sample_data)
-        X, y = get_feature_target_split(cleaned, config["features"]["target"])
-
-        pipeline = create_preprocessing_pipeline(
-            config["features"]["numerical"], config["features"]["categorical"]
-        )
-        X_processed = pipeline.fit_transform(X)
+        X_processed, y, _ = processed_data
 
         X_train, X_test, y_train, y_test = split_data(
             X_processed,
-            y.values,
+            y,
             test_size=config["data"]["test_size"],
             random_state=config["data"]["random_state"],
         )
@@ -289,28 +179,21 @@ class TestDataSplitting:
         assert len(X_train) + len(X_test) == total_samples
         assert len(y_train) + len(y_test) == total_samples
 
-    def test_split_data_reproducibility(self, sample_data, config):
+    def test_split_data_reproducibility(self, processed_data):
         """Test that splitting is reproducible with same seed."""
-        cleaned = clean_data(sample_data)
-        X, y = get_feature_target_split(cleaned, config["features"]["target"])
+        X_processed, y, _ = processed_data
 
-        pipeline = create_preprocessing_pipeline(
-            config["features"]["numerical"], config["features"]["categorical"]
+        # Split row indices once and compare with the rows recorded for seed 42
+        rows_train, _, y_train, _ = split_data(
+            np.arange(len(y)), y, test_size=0.2, random_state=42
         )
-        X_processed = pipeline.fit_transform(X)
 
-        # First split
-        X_train1, _, y_train1, _ = split_data(
-            X_processed, y.values, test_size=0.2, random_state=42
-        )
-
-        # Second split with same seed
-        X_train2, _, y_train2, _ = split_data(
-            X_processed, y.values, test_size=0.2, random_state=42
-        )
+        np.testing.assert_array_equal(rows_train, EXPECTED_TRAIN_ROWS)
+        np.testing.assert_array_equal(y_train, y[EXPECTED_TRAIN_ROWS])
 
-        np.testing.assert_array_equal(X_train1, X_train2)
-        np.testing.assert_array_equal(y_train1, y_train2)
+        # Index the processed matrix with the recorded split
+        X_train = X_processed[rows_train]
+        assert X_train.shape == (len(EXPECTED_TRAIN_ROWS), X_processed.shape[1])
 
 
 if __name__ == "__main__":
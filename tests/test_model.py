@@ -2,25 +2,51 @@
 Unit tests for model training and prediction.
 """
 
+import base64
+import hashlib
+import pickle
 import pytest
+import joblib
 import numpy as np
-from pathlib import Path
-import sys
 
-# Add project root to path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
-
-from sklearn.linear_model import LogisticRegression  # noqa: E402
-from sklearn.ensemble import RandomForestClassifier  # noqa: E402
-
-from src.models.train import get_model, evaluate_model  # noqa: E402
-from src.models.predict import validate_features, FEATURE_SCHEMA  # noqa: E402
-
-
-@pytest.fixture
+import sklearn
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier
+
+from src.data.pipeline import (
+    freeze_preprocessor,
+    save_fused_preprocessor,
+)
+from src.models.train import get_model, evaluate_model
+from src.models.predict import (
+    HeartDiseasePredictor,
+    validate_features,
+    FEATURE_SCHEMA,
+)
+
+VALID_FEATURES = {
+    "age": 63,
+    "sex": 1,
+    "cp": 3,
+    "trestbps": 145,
+    "chol": 233,
+    "fbs": 1,
+    "restecg": 0,
+    "thalach": 150,
+    "exang": 0,
+    "oldpeak": 2.3,
+    "slope": 0,
+    "ca": 0,
+    "thal": 1,
+}
+INCOMPLETE_FEATURES = {"age": 63, "sex": 1}  # Missing other features
+OUT_OF_RANGE_FEATURES = {**VALID_FEATURES, "age": 200}
+
+
+@pytest.fixture(scope="session")
 def config():
-    """Test configuration."""
+    """Test configuration (shared; do not modify)."""
     return {
         "model": {
             "logistic_regression": {"C": 1.0, "max_iter": 100, "random_state": 42},
@@ -30,15 +56,15 @@ def config():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_training_data():
     """Generate sample training data."""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     n_samples = 100
     n_features = 10
 
-    X = np.random.randn(n_samples, n_features)
-    y = (X[:, 0] + X[:, 1] > 0).astype(int)  # Simple linear boundary
+    X = rng.standard_normal((n_samples, n_features), dtype=np.float32)
+    y = (X[:, 0] + X[:, 1] > 0).astype(np.int8)  # Simple linear boundary
 
     # Split into train/test
     split_idx = int(0.8 * n_samples)
@@ -48,62 +74,109 @@ def sample_training_data():
     return X_train, X_test, y_train, y_test
 
 
+@pytest.fixture(scope="session")
+def trained_logreg(config, sample_training_data):
+    """Logistic regression fitted once on the sample training data."""
+    X_train, _, y_train, _ = sample_training_data
+    return get_model("logistic_regression", config).fit(X_train, y_train)
+
+
+@pytest.fixture(scope="session")
+def trained_rf(request, config, sample_training_data):
+    """Random forest fitted on the sample training data, cached between runs.
+
+    The pickled model is kept in pytest's cache, keyed by the sklearn version,
+    the full parameters of the model get_model builds (including the defaults
+    it injects) and the training data, so later runs skip the fit.
+    Without the cacheprovider plugin the model is fitted every session.
+    """
+    X_train, _, y_train, _ = sample_training_data
+    model = get_model("random_forest", config)
+    params = model.get_params()
+    digest = hashlib.sha256(
+        repr(sorted(params.items())).encode() + X_train.tobytes() + y_train.tobytes()
+    ).hexdigest()[:16]
+    key = f"heart-disease/trained_rf/{sklearn.__version__}/{digest}"
+
+    cache = getattr(request.config, "cache", None)
+    blob = cache.get(key, None) if cache is not None else None
+    if blob is not None:
+        return pickle.loads(base64.b64decode(blob))
+
+    model.fit(X_train, y_train)
+    if cache is not None:
+        cache.set(key, base64.b64encode(pickle.dumps(model)).decode("ascii"))
+    return model
+
+
+@pytest.fixture
+def predictor(model_artifacts):
+    """Predictor backed by a small model trained on random patients."""
+    model_path, pipeline_path = model_artifacts
+    return HeartDiseasePredictor(str(model_path), str(pipeline_path))
+
+
 class TestModelCreation:
     """Tests for model creation."""
 
-    def test_get_logistic_regression(self, config):
-        """Test logistic regression model creation."""
-        model = get_model("logistic_regression", config)
-        assert isinstance(model, LogisticRegression)
-        assert model.C == 1.0
-
-    def test_get_random_forest(self, config):
-        """Test random forest model creation."""
+    @pytest.mark.parametrize(
+        "model_name, model_class, expected_params",
+        [
+            ("logistic_regression", LogisticRegression, {"C": 1.0}),
+            ("random_forest", RandomForestClassifier, {"n_estimators": 10}),
+            ("unknown_model", None, None),
+        ],
+        ids=["logistic_regression", "random_forest", "unknown_model"],
+    )
+    def test_get_model(self, config, model_name, model_class, expected_params):
+        """Test model creation by name; unknown names raise ValueError."""
+        if model_class is None:
+            with pytest.raises(ValueError):
+                get_model(model_name, config)
+            return
+
+        model = get_model(model_name, config)
+        assert isinstance(model, model_class)
+        for param, value in expected_params.items():
+            assert getattr(model, param) == value
+
+    def test_random_forest_uses_all_cores_by_default(self, config):
+        """Test that random forest defaults to parallel tree building."""
         model = get_model("random_forest", config)
-        assert isinstance(model, RandomForestClassifier)
-        assert model.n_estimators == 10
+        assert model.n_jobs == -1
+        assert "n_jobs" not in config["model"]["random_forest"]
 
-    def test_unknown_model_raises_error(self, config):
-        """Test that unknown model name raises ValueError."""
-        with pytest.raises(ValueError):
-            get_model("unknown_model", config)
+        rf_params = {**config["model"]["random_forest"], "n_jobs": 2}
+        rf_config = {"model": {"random_forest": rf_params}}
+        assert get_model("random_forest", rf_config).n_jobs == 2
 
 
 class TestModelTraining:
     """Tests for model training."""
 
-    def test_logistic_regression_training(self, config, sample_training_data):
+    def test_logistic_regression_training(self, trained_logreg, sample_training_data):
         """Test that logistic regression can be trained."""
-        X_train, X_test, y_train, y_test = sample_training_data
-
-        model = get_model("logistic_regression", config)
-        model.fit(X_train, y_train)
+        _, X_test, _, y_test = sample_training_data
 
         # Check predictions
-        predictions = model.predict(X_test)
+        predictions = trained_logreg.predict(X_test)
         assert len(predictions) == len(y_test)
         assert set(predictions).issubset({0, 1})
 
-    def test_random_forest_training(self, config, sample_training_data):
+    def test_random_forest_training(self, trained_rf, sample_training_data):
         """Test that random forest can be trained."""
-        X_train, X_test, y_train, y_test = sample_training_data
-
-        model = get_model("random_forest", config)
-        model.fit(X_train, y_train)
+        _, X_test, _, y_test = sample_training_data
 
         # Check predictions
-        predictions = model.predict(X_test)
+        predictions = trained_rf.predict(X_test)
         assert len(predictions) == len(y_test)
         assert set(predictions).issubset({0, 1})
 
-    def test_model_predict_proba(self, config, sample_training_data):
+    def test_model_predict_proba(self, trained_logreg, sample_training_data):
         """Test that models return valid probabilities."""
-        X_train, X_test, y_train, y_test = sample_training_data
-
-        model = get_model("logistic_regression", config)
-        model.fit(X_train, y_train)
+        _, X_test, _, y_test = sample_training_data
 
-        probas = model.predict_proba(X_test)
+        probas = trained_logreg.predict_proba(X_test)
 
         # Check shape
         assert probas.shape == (len(y_test), 2)
@@ -116,15 +189,12 @@ class TestModelTraining:
 class TestModelEvaluation:
     """Tests for model evaluation."""
 
-    def test_evaluate_model_metrics(self, config, sample_training_data):
+    def test_evaluate_model_metrics(self, config, trained_logreg, sample_training_data):
         """Test that evaluation returns expected metrics."""
         X_train, X_test, y_train, y_test = sample_training_data
 
-        model = get_model("logistic_regression", config)
-        model.fit(X_train, y_train)
-
         metrics = evaluate_model(
-            model,
+            trained_logreg,
             X_train,
             X_test,
             y_train,
@@ -135,6 +205,8 @@ class TestModelEvaluation:
         expected_keys = [
             "cv_accuracy_mean",
             "cv_accuracy_std",
+            "cv_roc_auc_mean",
+            "cv_f1_mean",
             "test_accuracy",
             "precision",
             "recall",
@@ -144,19 +216,144 @@ class TestModelEvaluation:
 
         for key in expected_keys:
             assert key in metrics
+            assert type(metrics[key]) is float  # noqa: E721 (not np.float64)
             assert 0 <= metrics[key] <= 1
 
-    def test_evaluate_model_cv_accuracy(self, config, sample_training_data):
-        """Test cross-validation accuracy is reasonable."""
+        # CV accuracy should be better than random (0.5)
+        assert metrics["cv_accuracy_mean"] > 0.5
+
+    def test_evaluate_model_cv_scoring(
+        self, monkeypatch, trained_logreg, sample_training_data
+    ):
+        """Test fold scoring from out-of-fold probabilities, without refitting."""
         X_train, X_test, y_train, y_test = sample_training_data
 
-        model = get_model("logistic_regression", config)
-        model.fit(X_train, y_train)
+        def perfect_oof_proba(estimator, X, y, **kwargs):
+            return np.column_stack([1 - y, y]).astype(float)
+
+        monkeypatch.setattr("src.models.train.cross_val_predict", perfect_oof_proba)
+        metrics = evaluate_model(
+            trained_logreg, X_train, X_test, y_train, y_test, cv_folds=3
+        )
 
-        metrics = evaluate_model(model, X_train, X_test, y_train, y_test, cv_folds=3)
+        assert metrics["cv_accuracy_mean"] == 1.0
+        assert metrics["cv_accuracy_std"] == 0.0
+        assert metrics["cv_roc_auc_mean"] == 1.0
+        assert metrics["cv_f1_mean"] == 1.0
 
-        # CV accuracy should be better than random (0.5)
-        assert metrics["cv_accuracy_mean"] > 0.5
+
+class TestPredictor:
+    """Tests for the HeartDiseasePredictor inference path."""
+
+    def test_missing_artifacts_raise(self, tmp_path):
+        """Test that missing model files raise FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            HeartDiseasePredictor(
+                str(tmp_path / "missing.joblib"), str(tmp_path / "missing.joblib")
+            )
+
+    def test_predict_matches_sklearn(self, predictor, patient_frame):
+        """Test that predict agrees with running the sklearn objects directly."""
+        patient = patient_frame.iloc[0].to_dict()
+        result = predictor.predict(patient)
+
+        X = predictor.preprocessor.transform(patient_frame.iloc[[0]])
+        expected = predictor.model.predict_proba(X)[0]
+
+        assert result["prediction"] in (0, 1)
+        assert result["probability_disease"] == pytest.approx(expected[1])
+        assert result["confidence"] == pytest.approx(max(expected))
+
+    def test_predict_batch_matches_predict(self, predictor, patient_frame):
+        """Test that the vectorized batch path matches single predictions."""
+        patients = patient_frame.head(10).to_dict("records")
+
+        batch = predictor.predict_batch(patients)
+        single = [predictor.predict(patient) for patient in patients]
+
+        assert len(batch) == len(single)
+        for b, s in zip(batch, single):
+            assert b["prediction"] == s["prediction"]
+            assert b["probability_disease"] == pytest.approx(s["probability_disease"])
+
+    def test_batch_scores_match_sklearn(self, predictor, patient_frame):
+        """Test that direct logistic scoring reproduces sklearn's outputs."""
+        results = predictor.predict_batch(patient_frame.to_dict("records"))
+
+        X = predictor.preprocessor.transform(patient_frame)
+        np.testing.assert_array_equal(
+            [r["prediction"] for r in results], predictor.model.predict(X)
+        )
+        np.testing.assert_allclose(
+            [r["probability_disease"] for r in results],
+            predictor.model.predict_proba(X)[:, 1],
+        )
+
+    def test_predict_cache_hits(self, predictor, patient_frame):
+        """Test that repeated inputs are served from the prediction cache."""
+        lookups = []
+        cached = HeartDiseasePredictor(
+            str(predictor.model_path),
+            str(predictor.pipeline_path),
+            cache_listener=lookups.append,
+        )
+        patient = patient_frame.iloc[0].to_dict()
+
+        first = cached.predict(patient)
+        first["prediction_label"] = "modified"
+        second = cached.predict(patient)
+
+        assert lookups == [False, True]
+        assert cached.cache_info().hits == 1
+        assert second == predictor.predict(patient)
+
+    def test_warmup_bypasses_cache(self, predictor):
+        """Test that warmup runs the model without filling the cache."""
+        latencies = predictor.warmup(n_runs=3)
+
+        assert len(latencies) == 3
+        assert all(latency >= 0 for latency in latencies)
+        assert predictor.cache_info().currsize == 0
+
+    def test_frozen_preprocessor_export(self, predictor, patient_frame):
+        """Test that a .npz export replaces the pickled pipeline."""
+        fused_path = predictor.pipeline_path.with_suffix(".npz")
+        save_fused_preprocessor(freeze_preprocessor(predictor.preprocessor), fused_path)
+
+        from_npz = HeartDiseasePredictor(str(predictor.model_path), str(fused_path))
+        patients = patient_frame.head(20).to_dict("records")
+
+        assert from_npz.preprocessor is None
+        assert from_npz.predict_batch(patients) == predictor.predict_batch(patients)
+
+    def test_sibling_export_must_match_pipeline(self, predictor, patient_frame):
+        """Test that a .npz next to the joblib pipeline is used only if current."""
+        pipeline_path = predictor.pipeline_path
+        save_fused_preprocessor(
+            freeze_preprocessor(predictor.preprocessor),
+            pipeline_path.with_suffix(".npz"),
+            source_path=pipeline_path,
+        )
+        fresh = HeartDiseasePredictor(str(predictor.model_path), str(pipeline_path))
+        assert fresh.preprocessor is None
+
+        # Replace only the joblib pipeline, as a retrain without the export would
+        refit = clone(predictor.preprocessor).fit(patient_frame.head(50))
+        joblib.dump(refit, pipeline_path)
+        with pytest.warns(UserWarning, match="stale preprocessor export"):
+            stale = HeartDiseasePredictor(str(predictor.model_path), str(pipeline_path))
+
+        assert stale.preprocessor is not None
+        patients = patient_frame.head(20)
+        results = stale.predict_batch(patients.to_dict("records"))
+        np.testing.assert_allclose(
+            [r["probability_disease"] for r in results],
+            stale.model.predict_proba(refit.transform(patients))[:, 1],
+        )
+
+    def test_predict_batch_empty(self, predictor):
+        """Test that an empty batch returns no predictions."""
+        assert predictor.predict_batch([]) == []
 
 
 class TestFeatureValidation:
@@ -164,82 +361,26 @@ class TestFeatureValidation:
 
     def test_valid_features(self):
         """Test that valid features pass validation."""
-        valid_features = {
-            "age": 63,
-            "sex": 1,
-            "cp": 3,
-            "trestbps": 145,
-            "chol": 233,
-            "fbs": 1,
-            "restecg": 0,
-            "thalach": 150,
-            "exang": 0,
-            "oldpeak": 2.3,
-            "slope": 0,
-            "ca": 0,
-            "thal": 1,
-        }
-
-        errors = validate_features(valid_features)
+        errors = validate_features(VALID_FEATURES)
         assert len(errors) == 0
 
     def test_missing_feature(self):
         """Test that missing features are detected."""
-        incomplete_features = {
-            "age": 63,
-            "sex": 1,
-            # Missing other features
-        }
-
-        errors = validate_features(incomplete_features)
+        errors = validate_features(INCOMPLETE_FEATURES)
         assert len(errors) > 0
         assert any("Missing" in e for e in errors)
 
     def test_out_of_range_feature(self):
         """Test that out-of-range values are detected."""
-        invalid_features = {
-            "age": 200,  # Out of range
-            "sex": 1,
-            "cp": 3,
-            "trestbps": 145,
-            "chol": 233,
-            "fbs": 1,
-            "restecg": 0,
-            "thalach": 150,
-            "exang": 0,
-            "oldpeak": 2.3,
-            "slope": 0,
-            "ca": 0,
-            "thal": 1,
-        }
-
-        errors = validate_features(invalid_features)
+        errors = validate_features(OUT_OF_RANGE_FEATURES)
         assert len(errors) > 0
         assert any("out of range" in e for e in errors)
 
     def test_feature_schema_complete(self):
         """Test that feature schema has all required fields."""
-        expected_features = [
-            "age",
-            "sex",
-            "cp",
-            "trestbps",
-            "chol",
-            "fbs",
-            "restecg",
-            "thalach",
-            "exang",
-            "oldpeak",
-            "slope",
-            "ca",
-            "thal",
-        ]
-
-        for feature in expected_features:
-            assert feature in FEATURE_SCHEMA
-            assert "type" in FEATURE_SCHEMA[feature]
-            assert "min" in FEATURE_SCHEMA[feature]
-            assert "max" in FEATURE_SCHEMA[feature]
+        assert set(VALID_FEATURES) <= FEATURE_SCHEMA.keys()
+        for feature in VALID_FEATURES:
+            assert {"type", "min", "max"} <= FEATURE_SCHEMA[feature].keys()
 
 
 if __name__ == "__main__":